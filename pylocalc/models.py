@@ -1,16 +1,49 @@
+import socket
 import subprocess
 import time
 
-from contextlib import AbstractContextManager
+from contextlib import AbstractContextManager, contextmanager
 from decimal import Decimal
 from pathlib import Path
-from typing import Any, Callable, Iterable, Iterator, Optional, Tuple, TypeVar, Union, cast
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, TypeVar, Union, cast
 
 import uno
 
+from com.sun.star.uno import RuntimeException as UnoRuntimeException
+
 
 T = TypeVar("T")
 
+# Size of the first slice searched by `Sheet.find_index`, each following slice is twice as big
+_SEARCH_WINDOW = 64
+# Maximal number of `Cell` objects cached by `Sheet.get_cell` for each sheet
+_CELL_CACHE_SIZE = 4096
+# Delays (in seconds) between attempts in `Document.connect`, the delay doubles after each failed attempt
+_CONNECT_DELAY = 0.05
+_CONNECT_MAX_DELAY = 1.0
+_CONNECT_PROBE_TIMEOUT = 0.05
+# Timeout (in seconds) of the check whether soffice is already running before starting a new one
+_RUNNING_PROBE_TIMEOUT = 0.1
+
+
+# UNO URL resolver of the local component context, shared by all documents
+_resolver: Any = None
+# Remote component contexts keyed by UNO connection string (e.g. "socket,host=localhost,port=2002")
+_contexts: Dict[str, Any] = {}
+
+
+def _get_context(connection: str) -> Any:
+    """ Return (cached) component context of soffice listening on `connection`. """
+    global _resolver
+    if connection not in _contexts:
+        if _resolver is None:
+            local_context = uno.getComponentContext()
+            _resolver = local_context.ServiceManager.createInstanceWithContext(
+                "com.sun.star.bridge.UnoUrlResolver", local_context
+            )
+        _contexts[connection] = _resolver.resolve(f"uno:{connection};urp;StarOffice.ComponentContext")
+    return _contexts[connection]
+
 
 def _only_connected(function: Callable[..., T]) -> Callable[..., T]:
     """
@@ -26,9 +59,114 @@ def _only_connected(function: Callable[..., T]) -> Callable[..., T]:
     return wrapped
 
 
+def _set_number(uno_cell: Any, value: float) -> None:
+    uno_cell.Value = value
+
+
+def _set_string(uno_cell: Any, value: str) -> None:
+    uno_cell.String = value
+
+
+_Converter = Tuple[Callable[[Any], Union[float, str]], Callable[[Any, Any], None]]
+
+# Conversions of the most common value types for UNO and setters of the converted value, looked up by exact type
+_DATA_CONVERTERS: Dict[type, _Converter] = {
+    int: (float, _set_number),
+    float: (float, _set_number),
+    bool: (float, _set_number),
+    Decimal: (float, _set_number),
+    str: (str, _set_string),
+}
+
+
+def _converter(value: Any) -> _Converter:
+    """ Return conversion and setter of `value`, types missing in `_DATA_CONVERTERS` are classified by `isinstance`. """
+    converter = _DATA_CONVERTERS.get(type(value))
+    if converter is not None:
+        return converter
+    if isinstance(value, (int, float, Decimal)):
+        return _DATA_CONVERTERS[float]
+    return _DATA_CONVERTERS[str]
+
+
+def _to_uno_value(value: Any) -> Union[float, str]:
+    """
+    Convert Python value to the form accepted by UNO `setDataArray` and cell `Value`/`String`.
+    `setDataArray` only accepts (32-bit or smaller) numbers and strings, so e.g. `bool` or big `int` values
+    would make the whole call fail. Converting all numbers to `float` keeps every write on the bulk path.
+    """
+    return _converter(value)[0](value)
+
+
+def _index_of(values: Tuple[Any, ...], value: str) -> Optional[int]:
+    """ Return index of the first text (or empty) cell in `values` returned by UNO `getDataArray` or None. """
+    try:
+        return values.index(value)
+    except ValueError:
+        return None
+
+
+def _has_numbers(values: Tuple[Any, ...]) -> bool:
+    """ Return whether `values` returned by UNO `getDataArray` contain any numeric cell. """
+    return float in set(map(type, values))
+
+
+def _set_value(uno_cell: Any, value: Any) -> None:
+    """ Set single UNO cell using the same conversion as bulk writes. """
+    convert, setter = _converter(value)
+    setter(uno_cell, convert(value))
+
+
+# Pythonic names of UNO cell properties accepted by `Cell.update`
+_CELL_PROPERTIES = {
+    "style": "CellStyle",
+    "number_format": "NumberFormat",
+    "background_color": "CellBackColor",
+    "font_weight": "CharWeight",
+    "font_color": "CharColor",
+}
+
+
+def _contiguous_blocks(values: Dict[Tuple[int, int], Any]) -> List[Tuple[int, int, List[List[Any]]]]:
+    """
+    Split values keyed by `(column, row)` into rectangular blocks of adjacent cells.
+    Return list of `(start column, start row, rows of values)`.
+    """
+    columns_by_row: Dict[int, List[int]] = {}
+    for column, row in values:
+        columns_by_row.setdefault(row, []).append(column)
+    blocks: List[Tuple[int, int, List[List[Any]]]] = []
+    # Blocks that end in the previously processed row keyed by their (start column, end column)
+    open_blocks: Dict[Tuple[int, int], Tuple[int, int, List[List[Any]]]] = {}
+    for row in sorted(columns_by_row):
+        columns = sorted(columns_by_row[row])
+        runs = []
+        run_start = previous = columns[0]
+        for column in columns[1:]:
+            if column != previous + 1:
+                runs.append((run_start, previous))
+                run_start = column
+            previous = column
+        runs.append((run_start, previous))
+        next_open_blocks = {}
+        for run in runs:
+            row_values = [values[column, row] for column in range(run[0], run[1] + 1)]
+            block = open_blocks.get(run)
+            if block is not None and block[1] + len(block[2]) == row:
+                block[2].append(row_values)
+            else:
+                block = (run[0], row, [row_values])
+                blocks.append(block)
+            next_open_blocks[run] = block
+        open_blocks = next_open_blocks
+    return blocks
+
+
 class BaseObject:
     """ Base class for all UNO objects. """
 
+    __slots__ = ("_uno_obj",)
+
     def __init__(self, uno_obj: Any):
         self._uno_obj = uno_obj
 
@@ -44,33 +182,98 @@ class BaseObject:
 
 
 class Cell(BaseObject):
+    # Cells are created in large numbers, slots save memory and make attribute access faster
+    __slots__ = ("_sheet", "_addr", "_row", "_col", "_column_name")
+
+    def __init__(self, uno_obj: Any, sheet: Optional["Sheet"] = None, position: Optional[Tuple[int, int]] = None):
+        """
+        :param uno_obj: UNO cell object, `None` to get it from `sheet` at `position` when it is first needed
+        :param sheet: sheet the cell belongs to
+        :param position: already known `(column, row)` of the cell (saves UNO calls)
+        """
+        super().__init__(uno_obj)
+        self._sheet = sheet
+        self._addr: Any = None
+        self._col: Optional[int] = None
+        self._row: Optional[int] = None
+        if position is not None:
+            self._col, self._row = position
+        self._column_name: Optional[str] = None
+
+    @property
+    def _uno_cell(self) -> Any:
+        # Cells created by position get their UNO object only when they need it,
+        # so e.g. writes inside `Sheet.batch` block do not need any UNO calls
+        if self._uno_obj is None:
+            self._uno_obj = cast("Sheet", self._sheet)._raw_cell(self.column_index, self.row_index)
+        return self._uno_obj
+
+    @property
+    def _position(self) -> Tuple[int, int]:
+        """ Current `(column, row)` of the cell. """
+        if self._uno_obj is None:
+            return self.column_index, self.row_index
+        # UNO cell moves with its content when rows or columns are inserted or removed,
+        # use its live address so that buffered and direct writes go to the same cell
+        address = self._uno_obj.CellAddress
+        return int(address.Column), int(address.Row)
+
     @property
     def value(self) -> str:
-        """ Value of the cell. """
-        return str(self._uno_obj.String)
+        """
+        Value of the cell.
+        Values set inside `Sheet.batch` block are not visible before the block ends.
+        """
+        return str(self._uno_cell.String)
 
     @value.setter
     def value(self, value: Any) -> None:
-        if isinstance(value, (int, float)):
-            self._uno_obj.Value = value
-        elif isinstance(value, Decimal):
-            self._uno_obj.Value = float(value)
-        else:
-            self._uno_obj.String = str(value)
+        if self._sheet is not None and self._sheet._batch is not None:
+            self._sheet._batch[self._position] = value
+            return
+        _set_value(self._uno_cell, value)
+
+    def update(self, **properties: Any) -> None:
+        """
+        Set value and other properties of the cell with as few UNO calls as possible.
+        `value` is set the same way as `Cell.value`, all other properties are set at once
+        by a single `setPropertyValues` call.
+        Properties can be passed by the names in `_CELL_PROPERTIES` or by their UNO names.
+        :param properties: e.g. `value=12.2, number_format=4, CharHeight=14.0`
+        """
+        if "value" in properties:
+            self.value = properties.pop("value")
+        if properties:
+            uno_properties = {_CELL_PROPERTIES.get(name, name): value for name, value in properties.items()}
+            # `setPropertyValues` requires the names to be sorted
+            names = tuple(sorted(uno_properties))
+            self._uno_cell.setPropertyValues(names, tuple(uno_properties[name] for name in names))
+
+    @property
+    def _address(self) -> Any:
+        if self._addr is None:
+            self._addr = self._uno_cell.RangeAddress
+        return self._addr
 
     @property
     def row_index(self) -> int:
         """ Zero-based row index of the cell. """
-        return int(self._uno_obj.RangeAddress.StartRow)
+        if self._row is None:
+            self._row = int(self._address.StartRow)
+        return self._row
 
     @property
     def column_index(self) -> int:
         """ Zero-based column index of the cell. """
-        return int(self._uno_obj.RangeAddress.StartColumn)
+        if self._col is None:
+            self._col = int(self._address.StartColumn)
+        return self._col
 
     @property
     def column_name(self) -> str:
-        return str(self._uno_obj.Columns.getByIndex(0).Name)
+        if self._column_name is None:
+            self._column_name = str(self._uno_cell.Columns.getByIndex(0).Name)
+        return self._column_name
 
     @property
     def name(self) -> str:
@@ -78,39 +281,202 @@ class Cell(BaseObject):
 
     @property
     def is_empty(self) -> bool:
-        return str(self._uno_obj.Type.value) == "EMPTY"
+        return str(self._uno_cell.Type.value) == "EMPTY"
 
     def parent(self) -> "Sheet":
-        return Sheet(self._uno_obj.Spreadsheet)
+        if self._sheet is not None:
+            return self._sheet
+        return Sheet(self._uno_cell.Spreadsheet)
 
 
 class Sheet(BaseObject):
+    __slots__ = ("_batch", "_columns", "_rows", "_cells", "_search_descriptor")
+
+    def __init__(self, uno_obj: Any):
+        super().__init__(uno_obj)
+        # Values waiting to be written keyed by (column, row), `None` outside of `batch` block
+        self._batch: Optional[Dict[Tuple[int, int], Any]] = None
+        self._columns: Optional[int] = None
+        self._rows: Optional[int] = None
+        # Cells returned by `get_cell` keyed by the cell index
+        self._cells: Dict[Union[str, Tuple[int, int]], Cell] = {}
+        self._search_descriptor: Any = None
+
+    @property
+    def _columns_count(self) -> int:
+        if self._columns is None:
+            self._columns = int(self._uno_obj.Columns.Count)
+        return self._columns
+
+    @property
+    def _rows_count(self) -> int:
+        if self._rows is None:
+            self._rows = int(self._uno_obj.Rows.Count)
+        return self._rows
+
+    def invalidate(self) -> None:
+        """ Drop cached sheet properties and cells, call it after changing the structure of the sheet. """
+        self._columns = None
+        self._rows = None
+        # UNO cells move with their content when rows or columns are inserted or removed
+        self._cells.clear()
+
+    def _raw_cell(self, column: int, row: int) -> Any:
+        """ UNO cell object at the position, without the `Cell` wrapper. """
+        return self._uno_obj.getCellByPosition(column, row)
+
     def get_cell(self, cell_index: Union[str, Tuple[int, int]]) -> "Cell":
-        try:
-            if isinstance(cell_index, str):
-                if ":" in cell_index:
-                    raise Exception
-                cell = self._uno_obj.getCellRangeByName(cell_index)
-            elif isinstance(cell_index, tuple):
-                cell = self._uno_obj.getCellByPosition(*cell_index)
-            return Cell(cell)
-        except:
+        """
+        Get cell by position `(column, row)` or by name.
+        Cells are cached, so repeated access does not need any UNO calls.
+        Cached cells move with their content, call `invalidate` after rows or columns were inserted or removed.
+        """
+        if not isinstance(cell_index, (str, tuple)):
             raise IndexError(f'"{cell_index}" not found')
+        try:
+            cell = self._cells.get(cell_index)
+        except TypeError:
+            # Tuple with unhashable items, e.g. `sheet[0, [1]]`
+            raise IndexError(f'"{cell_index}" not found') from None
+        if cell is None:
+            cell = self._get_cell(cell_index)
+            if len(self._cells) >= _CELL_CACHE_SIZE:
+                # Drop the oldest cell
+                del self._cells[next(iter(self._cells))]
+            self._cells[cell_index] = cell
+        return cell
+
+    def _get_cell(self, cell_index: Union[str, Tuple[int, int]]) -> "Cell":
+        if isinstance(cell_index, tuple) and len(cell_index) == 2:
+            column, row = cell_index
+            if (
+                isinstance(column, int)
+                and isinstance(row, int)
+                and 0 <= column < self._columns_count
+                and 0 <= row < self._rows_count
+            ):
+                return Cell(None, self, (column, row))
+        elif isinstance(cell_index, str) and ":" not in cell_index:
+            try:
+                return Cell(self._uno_obj.getCellRangeByName(cell_index), sheet=self)
+            except UnoRuntimeException:
+                pass
+        raise IndexError(f'"{cell_index}" not found')
 
     def __getitem__(self, key: Union[str, Tuple[int, int]]) -> "Cell":
         return self.get_cell(key)
 
-    def append_row(self, values: Iterable[Any], offset: int = 0) -> None:
+    def cells_in_range(self, start_column: int, start_row: int, end_column: int, end_row: int) -> List["Cell"]:
+        """
+        Return cells of the range (all indices inclusive) row by row.
+        Cells are created locally, UNO cell objects are only fetched when they are needed.
+        """
+        if not (
+            0 <= start_column <= end_column < self._columns_count and 0 <= start_row <= end_row < self._rows_count
+        ):
+            raise IndexError(f'"{(start_column, start_row, end_column, end_row)}" not found')
+        return [
+            Cell(None, self, (column, row))
+            for row in range(start_row, end_row + 1)
+            for column in range(start_column, end_column + 1)
+        ]
+
+    def _set_data(self, column: int, row: int, values: Sequence[Sequence[Any]]) -> None:
+        """
+        Write 2D `values` to the sheet starting at (`column`, `row`) in as few UNO calls as possible.
+        Rectangular input is written with a single `setDataArray` call, ragged input row by row.
+        """
+        self._flush()
+        rows = [tuple(_to_uno_value(value) for value in row_values) for row_values in values]
+        if not rows:
+            return
+        width = len(rows[0])
+        if all(len(row_values) == width for row_values in rows):
+            if width:
+                cell_range = self._uno_obj.getCellRangeByPosition(column, row, column + width - 1, row + len(rows) - 1)
+                cell_range.setDataArray(tuple(rows))
+            return
+        for row_index, row_values in enumerate(rows, start=row):
+            if row_values:
+                self._set_data(column, row_index, (row_values,))
+
+    def _flush(self) -> None:
+        """ Write values buffered by the current `batch` block, so that reads and other writes see them. """
+        if self._batch:
+            # Empty the buffer first, `_set_data` flushes too
+            values, self._batch = self._batch, {}
+            for column, row, block_values in _contiguous_blocks(values):
+                self._set_data(column, row, block_values)
+
+    @contextmanager
+    def batch(self) -> Iterator[None]:
+        """
+        Buffer all `Cell.value` assignments to cells of this sheet and write them
+        in as few UNO calls as possible when the block ends.
+        Buffered values are written before `find_index` and `append_*` calls inside the block.
+        If the block raises an exception, values that were not written yet are discarded.
+        """
+        if self._batch is not None:
+            # Nested block, the outermost one writes the values
+            yield
+            return
+        self._batch = {}
+        try:
+            yield
+        except BaseException:
+            self._batch = None
+            raise
+        try:
+            self._flush()
+        finally:
+            self._batch = None
+
+    def append_rows(self, values: Iterable[Iterable[Any]], offset: int = 0) -> None:
+        """
+        Append multiple rows at once to the first empty row (looking at the `offset` column).
+        """
         empty_index = self.find_index("", column=offset, find_empty=True)
-        for col_index, value in enumerate(values):
-            cell = self[col_index + offset, empty_index]
-            cell.value = value
+        self._set_data(offset, empty_index, [tuple(row_values) for row_values in values])
+
+    def append_row(self, values: Iterable[Any], offset: int = 0) -> None:
+        self.append_rows([values], offset=offset)
 
     def append_column(self, values: Iterable[Any], offset: int = 0) -> None:
         empty_index = self.find_index("", row=offset, find_empty=True)
-        for row_index, value in enumerate(values):
-            cell = self[empty_index, row_index + offset]
-            cell.value = value
+        self._set_data(empty_index, offset, [(value,) for value in values])
+
+    def _search_ranges(
+        self, min_index: int, max_index: int, *, row: Optional[int] = None, column: Optional[int] = None
+    ) -> Iterator[Tuple[int, Any]]:
+        """
+        Yield `(start index, cell range)` of consecutive slices of `row` or `column` between `min_index` (inclusive)
+        and `max_index` (exclusive). Slices grow exponentially so that searches near the beginning
+        do not have to query the whole (up to 1M cells long) row or column.
+        """
+        window = _SEARCH_WINDOW
+        window_start = min_index
+        while window_start < max_index:
+            window_end = min(max_index, window_start + window)
+            if row is not None:
+                yield window_start, self._uno_obj.getCellRangeByPosition(window_start, row, window_end - 1, row)
+            else:
+                yield window_start, self._uno_obj.getCellRangeByPosition(column, window_start, column, window_end - 1)
+            window_start = window_end
+            window *= 2
+
+    def _value_search(self, value: str) -> Any:
+        """ UNO search descriptor matching whole cells whose displayed text is equal to `value`. """
+        if self._search_descriptor is None:
+            descriptor = self._uno_obj.createSearchDescriptor()
+            descriptor.SearchWords = True  # Whole cells in Calc
+            descriptor.SearchCaseSensitive = True
+            descriptor.SearchRegularExpression = False
+            descriptor.SearchWildcard = False
+            descriptor.SearchSimilarity = False
+            descriptor.SearchType = 1  # Values, not formulas
+            self._search_descriptor = descriptor
+        self._search_descriptor.SearchString = value
+        return self._search_descriptor
 
     def find_index(
         self,
@@ -137,53 +503,114 @@ class Sheet(BaseObject):
             raise IndexError("Both `row` and `column` cannot be `None`.")
         if row is not None and column is not None:
             raise IndexError("Both `row` and `column` cannot have values.")
-        matches = lambda cell: (cell.is_empty() if find_empty else cell.value == value)
-        fixed_index = row or column
-        count = int(self._uno_obj.Columns.Count) if row is not None else int(self._uno_obj.Rows.Count)
+        self._flush()
+        count = self._columns_count if row is not None else self._rows_count
         min_index = max(0, start or 0)
         max_index = min(count, end or count)
-        for index in range(min_index, max_index):
-            if (row is not None and self[index, row].value == value) or (
-                column is not None and self[column, index].value == value
-            ):
-                return index
+        for window_start, cell_range in self._search_ranges(min_index, max_index, row=row, column=column):
+            if find_empty:
+                addresses = cell_range.queryEmptyCells().getRangeAddresses()
+                if addresses:
+                    if row is not None:
+                        return min(int(address.StartColumn) for address in addresses)
+                    return min(int(address.StartRow) for address in addresses)
+                continue
+            data = cell_range.getDataArray()
+            values = data[0] if row is not None else next(zip(*data))
+            index = _index_of(values, value)
+            # Displayed text of numeric cells (numbers, dates, booleans, ...) is only known to Calc, search there
+            if _has_numbers(values if index is None else values[:index]):
+                found = cell_range.findFirst(self._value_search(value))
+                if found is not None:
+                    address = found.CellAddress
+                    return int(address.Column) if row is not None else int(address.Row)
+            if index is not None:
+                return window_start + index
         raise ValueError("Not found.")
 
 
 class Document(BaseObject, AbstractContextManager):
-    def __init__(self, path: Union[str, Path], port: int = 2002, host: str = "localhost") -> None:
+    # soffice processes started by this library keyed by UNO connection string, shared by all documents
+    _processes: Dict[str, subprocess.Popen] = {}
+
+    def __init__(
+        self, path: Union[str, Path], port: int = 2002, host: str = "localhost", pipe: Optional[str] = None
+    ) -> None:
+        """
+        :param path: path to the document
+        :param port: port of the soffice socket connection
+        :param host: host of the soffice socket connection
+        :param pipe: name of the pipe to connect to soffice through instead of a TCP socket (faster), ignores `port`
+            and `host`
+        """
         self.connected = False
         self._process: Optional[subprocess.Popen] = None
+        self._desktop: Any = None
         self._path = path
         self._port = port
         self._host = host
+        self._pipe = pipe
+        self._sheet_names: Optional[Tuple[str, ...]] = None
+        self._sheets: Dict[str, "Sheet"] = {}
         super().__init__(None)
 
-    def connect(self, max_tries: int = 10) -> None:
-        self._process = subprocess.Popen(
-            f'soffice --headless --accept="socket,host={self._host},port={self._port};'
-            f'urp;StarOffice.ServiceManager" "{self._path}"',
-            shell=True,
-        )
+    @property
+    def _connection(self) -> str:
+        if self._pipe is not None:
+            return f"pipe,name={self._pipe}"
+        return f"socket,host={self._host},port={self._port}"
+
+    def _is_listening(self, timeout: float = _CONNECT_PROBE_TIMEOUT) -> bool:
+        """ Cheap check whether soffice accepts TCP connections, without the expensive UNO resolve. """
+        try:
+            with socket.create_connection((self._host, self._port), timeout=timeout):
+                return True
+        except OSError:
+            return False
+
+    def connect(self, max_tries: int = 15) -> None:
+        # Reuse soffice that is already listening instead of starting another one that would fail to bind the port
+        if self._pipe is not None:
+            # Named pipes cannot be probed portably, only reuse soffice started by this library
+            process = Document._processes.get(self._connection)
+            already_running = process is not None and process.poll() is None
+        else:
+            already_running = self._is_listening(timeout=_RUNNING_PROBE_TIMEOUT)
+        if already_running:
+            self._process = Document._processes.get(self._connection)
+        else:
+            self._process = subprocess.Popen(
+                [
+                    "soffice",
+                    "--headless",
+                    f"--accept={self._connection};urp;StarOffice.ServiceManager",
+                    str(self._path),
+                ]
+            )
+            Document._processes[self._connection] = self._process
         last_error = None
-        for _ in range(max_tries):
-            try:
-                local_context = uno.getComponentContext()
-                resolver = local_context.ServiceManager.createInstanceWithContext(
-                    "com.sun.star.bridge.UnoUrlResolver", local_context
-                )
-                context = resolver.resolve(
-                    f"uno:socket,host={self._host},port={self._port};urp;StarOffice.ComponentContext"
-                )
-                manager = context.ServiceManager
-                desktop = manager.createInstanceWithContext("com.sun.star.frame.Desktop", context)
-                self._uno_obj = desktop.getCurrentComponent()
-                if self._uno_obj is not None:
-                    self.connected = True
-                    break
-            except Exception as e:
-                last_error = e
-                time.sleep(1)
+        for attempt in range(max_tries):
+            # Cheap check that soffice accepts connections before the expensive UNO resolve
+            if self._pipe is not None or self._is_listening():
+                try:
+                    context = _get_context(self._connection)
+                    manager = context.ServiceManager
+                    self._desktop = manager.createInstanceWithContext("com.sun.star.frame.Desktop", context)
+                    if already_running:
+                        url = uno.systemPathToFileUrl(str(Path(self._path).resolve()))
+                        self._uno_obj = self._desktop.loadComponentFromURL(url, "_blank", 0, ())
+                    else:
+                        self._uno_obj = self._desktop.getCurrentComponent()
+                    if self._uno_obj is not None:
+                        self.connected = True
+                        self.refresh()
+                        break
+                except Exception as e:
+                    last_error = e
+                    # Cached context may belong to soffice that is no longer running
+                    _contexts.pop(self._connection, None)
+            # soffice is not listening yet, failed to connect or has not loaded the document yet
+            time.sleep(min(_CONNECT_DELAY * 2 ** attempt, _CONNECT_MAX_DELAY))
         else:
             raise ConnectionError(
                 f"Failed to connect to the document {self._path}\n"
@@ -194,33 +621,44 @@ class Document(BaseObject, AbstractContextManager):
     def save(self) -> None:
         self._uno_obj.store()
 
+    def refresh(self) -> None:
+        """ Drop cached sheet names and sheets, e.g. after sheets were added, removed or renamed. """
+        self._sheet_names = None
+        self._sheets.clear()
+
     @_only_connected
     def close(self) -> None:
+        self.refresh()
         self._uno_obj.close(0)
-        if self._process is not None:
+        # Terminate soffice started by this library only when no other document uses it
+        if self._process is not None and not self._desktop.Components.createEnumeration().hasMoreElements():
+            _contexts.pop(self._connection, None)
+            Document._processes.pop(self._connection, None)
             self._process.terminate()
             self._process.wait()
 
     @_only_connected
     def get_sheet(self, sheet_id: Union[str, int]) -> "Sheet":
         """ Get sheet by index or name """
-        try:
-            if isinstance(sheet_id, int):
-                return Sheet(self._uno_obj.Sheets.getByIndex(sheet_id))
-            if isinstance(sheet_id, str):
-                return Sheet(self._uno_obj.Sheets.getByName(sheet_id))
-        except:
-            raise IndexError(f'"{sheet_id}" not found')
-        raise NotImplementedError(f"Key of type {type(sheet_id)} is not supported.")
+        if not isinstance(sheet_id, (int, str)):
+            raise NotImplementedError(f"Key of type {type(sheet_id)} is not supported.")
+        if isinstance(sheet_id, int):
+            if not 0 <= sheet_id < len(self.sheet_names):
+                raise IndexError(f'"{sheet_id}" not found')
+            # Sheets are cached by name only, so that there is exactly one `Sheet` for each sheet
+            sheet_name = self.sheet_names[sheet_id]
+        else:
+            sheet_name = sheet_id
+        if sheet_name not in self._sheets:
+            if sheet_name not in self.sheet_names:
+                raise IndexError(f'"{sheet_id}" not found')
+            self._sheets[sheet_name] = Sheet(self._uno_obj.Sheets.getByName(sheet_name))
+        return self._sheets[sheet_name]
 
     @_only_connected
     def __iter__(self) -> Iterator["Sheet"]:
-        iterator = self._uno_obj.Sheets.createEnumeration()
-        while True:
-            try:
-                yield Sheet(iterator.nextElement())
-            except:
-                break
+        for name in self.sheet_names:
+            yield self.get_sheet(name)
 
     def __getitem__(self, key: Union[str, int]) -> "Sheet":
         return self.get_sheet(key)
@@ -244,7 +682,9 @@ class Document(BaseObject, AbstractContextManager):
     def sheet_names(self) -> Tuple[str, ...]:
         if not self.connected:
             return tuple()
-        return cast(Tuple[str, ...], self._uno_obj.Sheets.ElementNames)
+        if self._sheet_names is None:
+            self._sheet_names = tuple(cast(Tuple[str, ...], self._uno_obj.Sheets.ElementNames))
+        return self._sheet_names
 
     def __len__(self) -> int:
         return len(self.sheet_names)
@@ -0,0 +1,391 @@
+from decimal import Decimal
+from types import SimpleNamespace
+from typing import Any, Dict, List, Tuple
+
+import pytest
+
+from pylocalc import models
+from pylocalc.models import Document, Sheet, _contiguous_blocks, _has_numbers, _index_of, _set_value, _to_uno_value
+
+
+def _display(value: Any) -> str:
+    """ Text that the fake sheet displays for a cell value. """
+    return f"{value:g}" if isinstance(value, float) else str(value)
+
+
+class FakeUnoCell:
+    def __init__(self, uno_sheet: "FakeUnoSheet", column: int, row: int):
+        self._uno_sheet = uno_sheet
+        self.CellAddress = SimpleNamespace(Column=column, Row=row)
+
+    @property
+    def String(self) -> str:
+        self._uno_sheet.calls.append("String")
+        address = self.CellAddress
+        return _display(self._uno_sheet.data.get((address.Column, address.Row), ""))
+
+
+class FakeRange:
+    def __init__(self, uno_sheet: "FakeUnoSheet", position: Tuple[int, ...]):
+        self._uno_sheet = uno_sheet
+        self._position = position
+
+    def _cells(self) -> List[Tuple[int, int]]:
+        start_column, start_row, end_column, end_row = self._position
+        return [
+            (column, row) for row in range(start_row, end_row + 1) for column in range(start_column, end_column + 1)
+        ]
+
+    def getDataArray(self) -> Tuple[Tuple[Any, ...], ...]:
+        self._uno_sheet.calls.append("getDataArray")
+        start_column, start_row, end_column, end_row = self._position
+        return tuple(
+            tuple(self._uno_sheet.data.get((column, row), "") for column in range(start_column, end_column + 1))
+            for row in range(start_row, end_row + 1)
+        )
+
+    def setDataArray(self, data: Tuple[Tuple[Any, ...], ...]) -> None:
+        self._uno_sheet.calls.append("setDataArray")
+        self._uno_sheet.writes.append((self._position, data))
+        for row_index, row_values in enumerate(data):
+            for column_index, value in enumerate(row_values):
+                self._uno_sheet.data[self._position[0] + column_index, self._position[1] + row_index] = value
+
+    def findFirst(self, descriptor: Any) -> Any:
+        self._uno_sheet.calls.append("findFirst")
+        for column, row in self._cells():
+            if _display(self._uno_sheet.data.get((column, row), "")) == descriptor.SearchString:
+                return FakeUnoCell(self._uno_sheet, column, row)
+        return None
+
+    def queryEmptyCells(self) -> Any:
+        self._uno_sheet.calls.append("queryEmptyCells")
+        addresses = [
+            SimpleNamespace(StartColumn=column, StartRow=row)
+            for column, row in self._cells()
+            if (column, row) not in self._uno_sheet.data
+        ]
+        return SimpleNamespace(getRangeAddresses=lambda: addresses)
+
+
+class FakeUnoSheet:
+    """ Sheet that keeps cell values keyed by `(column, row)` and records UNO calls made to it. """
+
+    def __init__(self, columns: int = 10, rows: int = 100) -> None:
+        self.Columns = SimpleNamespace(Count=columns)
+        self.Rows = SimpleNamespace(Count=rows)
+        self.data: Dict[Tuple[int, int], Any] = {}
+        self.calls: List[str] = []
+        self.writes: List[Tuple[Any, ...]] = []
+
+    def getCellRangeByPosition(self, *position: int) -> FakeRange:
+        self.calls.append("getCellRangeByPosition")
+        return FakeRange(self, position)
+
+    def getCellByPosition(self, column: int, row: int) -> FakeUnoCell:
+        self.calls.append("getCellByPosition")
+        return FakeUnoCell(self, column, row)
+
+    def createSearchDescriptor(self) -> Any:
+        self.calls.append("createSearchDescriptor")
+        return SimpleNamespace()
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        (1, 1.0),
+        (True, 1.0),
+        (False, 0.0),
+        (2 ** 40, float(2 ** 40)),
+        (1.5, 1.5),
+        (Decimal("0.111"), 0.111),
+        ("text", "text"),
+        ("", ""),
+        (None, "None"),
+    ],
+)
+def test_to_uno_value(value: Any, expected: Any) -> None:
+    result = _to_uno_value(value)
+    assert result == expected
+    assert type(result) is type(expected)
+
+
+def test_to_uno_value_subclasses() -> None:
+    class MyInt(int):
+        pass
+
+    class MyStr(str):
+        pass
+
+    assert type(_to_uno_value(MyInt(3))) is float
+    assert _to_uno_value(MyStr("a")) == "a"
+
+
+
+@pytest.mark.parametrize(
+    "value, name, expected",
+    [
+        (2, "Value", 2.0),
+        (True, "Value", 1.0),
+        (Decimal("0.5"), "Value", 0.5),
+        ("text", "String", "text"),
+        (None, "String", "None"),
+    ],
+)
+def test_set_value(value: Any, name: str, expected: Any) -> None:
+    uno_cell = SimpleNamespace()
+    _set_value(uno_cell, value)
+    assert vars(uno_cell) == {name: expected}
+    assert type(getattr(uno_cell, name)) is type(expected)
+
+
+def test_contiguous_blocks_rectangle() -> None:
+    values = {(1, 2): "a", (2, 2): "b", (1, 3): "c", (2, 3): "d"}
+    assert _contiguous_blocks(values) == [(1, 2, [["a", "b"], ["c", "d"]])]
+
+
+def test_contiguous_blocks_gaps() -> None:
+    values = {(0, 0): 1, (2, 0): 2, (0, 2): 3}
+    assert _contiguous_blocks(values) == [(0, 0, [[1]]), (2, 0, [[2]]), (0, 2, [[3]])]
+
+
+def test_contiguous_blocks_ragged_runs() -> None:
+    values = {(0, 0): 1, (1, 0): 2, (0, 1): 3, (0, 2): 4, (1, 2): 5}
+    assert _contiguous_blocks(values) == [(0, 0, [[1, 2]]), (0, 1, [[3]]), (0, 2, [[4, 5]])]
+
+
+def test_contiguous_blocks_empty() -> None:
+    assert _contiguous_blocks({}) == []
+
+
+@pytest.mark.parametrize(
+    "values, value, expected",
+    [
+        (("a", "b", "a"), "a", 0),
+        (("a", "b", "a"), "c", None),
+        (("a", "", "b"), "", 1),
+        ((1.0, "1"), "1", 1),
+        ((1.0,), "1", None),
+        ((), "a", None),
+    ],
+)
+def test_index_of(values: Tuple[Any, ...], value: str, expected: Any) -> None:
+    assert _index_of(values, value) == expected
+
+
+@pytest.mark.parametrize(
+    "values, expected",
+    [
+        (("a", "", "b"), False),
+        ((1.0, 2.0), True),
+        (("a", 2.0), True),
+        ((), False),
+    ],
+)
+def test_has_numbers(values: Tuple[Any, ...], expected: bool) -> None:
+    assert _has_numbers(values) == expected
+
+
+def test_batch_writes_blocks_at_the_end() -> None:
+    uno_sheet = FakeUnoSheet()
+    sheet = Sheet(uno_sheet)
+    with sheet.batch():
+        for row in range(100):
+            sheet[0, row].value = row
+            sheet[1, row].value = str(row)
+        # Buffered writes do not need any UNO calls
+        assert uno_sheet.calls == []
+    assert sheet._batch is None
+    assert uno_sheet.writes == [((0, 0, 1, 99), tuple((float(row), str(row)) for row in range(100)))]
+
+
+def test_batch_discards_values_on_error() -> None:
+    uno_sheet = FakeUnoSheet()
+    sheet = Sheet(uno_sheet)
+    with pytest.raises(KeyError):
+        with sheet.batch():
+            sheet[0, 0].value = 1
+            raise KeyError("error")
+    assert sheet._batch is None
+    assert uno_sheet.writes == []
+
+
+def test_set_data_flushes_batch() -> None:
+    uno_sheet = FakeUnoSheet()
+    sheet = Sheet(uno_sheet)
+    with sheet.batch():
+        sheet[0, 5].value = "x"
+        sheet._set_data(0, 6, [(1, 2)])
+        assert uno_sheet.writes == [((0, 5, 0, 5), (("x",),)), ((0, 6, 1, 6), ((1.0, 2.0),))]
+    assert len(uno_sheet.writes) == 2
+
+
+def test_append_inside_batch_sees_buffered_values() -> None:
+    uno_sheet = FakeUnoSheet()
+    sheet = Sheet(uno_sheet)
+    with sheet.batch():
+        sheet[0, 0].value = "x"
+        sheet.append_row(["y", "z"])
+    assert uno_sheet.data == {(0, 0): "x", (0, 1): "y", (1, 1): "z"}
+
+
+def test_find_index_text() -> None:
+    uno_sheet = FakeUnoSheet()
+    uno_sheet.data.update({(0, 3): "a", (0, 7): "b", (2, 1): "b"})
+    sheet = Sheet(uno_sheet)
+    assert sheet.find_index("b", column=0) == 7
+    assert sheet.find_index("b", row=1) == 2
+    with pytest.raises(ValueError):
+        sheet.find_index("c", column=0)
+    # Text only slices are searched locally
+    assert "findFirst" not in uno_sheet.calls
+
+
+def test_find_index_numbers_use_displayed_text() -> None:
+    uno_sheet = FakeUnoSheet(rows=5000)
+    uno_sheet.data.update({(0, row): float(row) for row in range(5000)})
+    sheet = Sheet(uno_sheet)
+    assert sheet.find_index("4999", column=0) == 4999
+    with pytest.raises(ValueError):
+        sheet.find_index("5000", column=0)
+    # Numeric slices are searched by Calc, not cell by cell
+    assert "getCellByPosition" not in uno_sheet.calls
+    assert "String" not in uno_sheet.calls
+    assert len(uno_sheet.calls) < 100
+
+
+def test_find_index_mixed_types() -> None:
+    uno_sheet = FakeUnoSheet()
+    uno_sheet.data.update({(0, 0): 1.0, (0, 1): 1.5, (0, 2): "1.5", (0, 3): "x"})
+    sheet = Sheet(uno_sheet)
+    assert sheet.find_index("1.5", column=0) == 1
+    assert sheet.find_index("x", column=0) == 3
+    with pytest.raises(ValueError):
+        sheet.find_index("1.0", column=0)
+
+
+def test_get_cell_cache(monkeypatch: Any) -> None:
+    monkeypatch.setattr(models, "_CELL_CACHE_SIZE", 2)
+    sheet = Sheet(FakeUnoSheet())
+    first = sheet[0, 0]
+    assert sheet[0, 0] is first
+    sheet[1, 0]
+    sheet[2, 0]
+    # The oldest cell was dropped
+    assert list(sheet._cells) == [(1, 0), (2, 0)]
+    assert sheet[0, 0] is not first
+    sheet.invalidate()
+    assert sheet._cells == {}
+
+
+@pytest.mark.parametrize("cell_index", [(0, [1]), (0, "a"), (1.0, 2.0), (10, 0), (0, -1), (0,), 5])
+def test_get_cell_invalid_index(cell_index: Any) -> None:
+    sheet = Sheet(FakeUnoSheet())
+    with pytest.raises(IndexError):
+        sheet.get_cell(cell_index)
+
+
+def test_batch_uses_live_address_of_moved_cell() -> None:
+    uno_sheet = FakeUnoSheet()
+    sheet = Sheet(uno_sheet)
+    cell = sheet[0, 5]
+    assert cell.value == ""
+    # Row inserted above the cell, its UNO cell moves down
+    cell._uno_cell.CellAddress.Row = 6
+    with sheet.batch():
+        cell.value = "x"
+    assert uno_sheet.data == {(0, 6): "x"}
+
+
+def test_find_index_windows() -> None:
+    uno_sheet = FakeUnoSheet(rows=1000)
+    uno_sheet.data.update({(0, 10): "a", (0, 100): "a", (0, 500): "a"})
+    sheet = Sheet(uno_sheet)
+    assert sheet.find_index("a", column=0) == 10
+    # Returned index is relative to the beginning of the column, not to `start`
+    assert sheet.find_index("a", column=0, start=11) == 100
+    assert sheet.find_index("a", column=0, start=101) == 500
+    with pytest.raises(ValueError):
+        sheet.find_index("a", column=0, start=11, end=100)
+    ranges = uno_sheet.calls.count("getCellRangeByPosition")
+    sheet.find_index("a", column=0, start=0, end=64)
+    # Search near the beginning only queries the first slice
+    assert uno_sheet.calls.count("getCellRangeByPosition") == ranges + 1
+
+
+def test_find_index_empty() -> None:
+    uno_sheet = FakeUnoSheet(rows=1000)
+    uno_sheet.data.update({(0, row): "x" for row in range(200)})
+    uno_sheet.data.update({(column, 3): "x" for column in range(5)})
+    sheet = Sheet(uno_sheet)
+    assert sheet.find_index("", column=0, find_empty=True) == 200
+    assert sheet.find_index("", row=3, find_empty=True) == 5
+    assert sheet.find_index("", column=1, start=4, find_empty=True) == 4
+
+
+class FakeUnoSheets:
+    def __init__(self, names: Tuple[str, ...]):
+        self.ElementNames = names
+        self.calls: List[str] = []
+
+    def getByName(self, name: str) -> FakeUnoSheet:
+        self.calls.append(name)
+        return FakeUnoSheet()
+
+
+def test_get_sheet_by_index_and_name() -> None:
+    document = Document("test.ods")
+    uno_sheets = FakeUnoSheets(("First", "Second"))
+    document._uno_obj = SimpleNamespace(Sheets=uno_sheets)
+    document.connected = True
+    assert document[1] is document["Second"]
+    assert document[0] is document["First"]
+    assert list(document) == [document[0], document[1]]
+    assert uno_sheets.calls == ["Second", "First"]
+    for sheet_id in (2, -1, "Third"):
+        with pytest.raises(IndexError):
+            document[sheet_id]
+    first = document[0]
+    document.refresh()
+    assert document[0] is not first
+
+
+def test_cells_in_range() -> None:
+    uno_sheet = FakeUnoSheet()
+    sheet = Sheet(uno_sheet)
+    cells = sheet.cells_in_range(1, 2, 2, 3)
+    assert [(cell.column_index, cell.row_index) for cell in cells] == [(1, 2), (2, 2), (1, 3), (2, 3)]
+    assert uno_sheet.calls == []
+
+
+@pytest.mark.parametrize(
+    "bounds", [(-1, 0, 0, 0), (0, -1, 0, 0), (2, 0, 1, 0), (0, 2, 0, 1), (0, 0, 10, 0), (0, 0, 0, 100)]
+)
+def test_cells_in_range_invalid_bounds(bounds: Tuple[int, int, int, int]) -> None:
+    sheet = Sheet(FakeUnoSheet())
+    with pytest.raises(IndexError):
+        sheet.cells_in_range(*bounds)
+
+
+def test_append_rows_single_call() -> None:
+    uno_sheet = FakeUnoSheet()
+    uno_sheet.data[1, 0] = "header"
+    sheet = Sheet(uno_sheet)
+    sheet.append_rows([("a", 1), ("b", Decimal("2.5"))], offset=1)
+    assert uno_sheet.writes == [((1, 1, 2, 2), (("a", 1.0), ("b", 2.5)))]
+
+
+def test_append_rows_ragged() -> None:
+    uno_sheet = FakeUnoSheet()
+    sheet = Sheet(uno_sheet)
+    sheet.append_rows([("a", "b"), (), ("c",)])
+    assert uno_sheet.writes == [((0, 0, 1, 0), (("a", "b"),)), ((0, 2, 0, 2), (("c",),))]
+
+
+def test_append_column() -> None:
+    uno_sheet = FakeUnoSheet()
+    uno_sheet.data[0, 0] = "header"
+    sheet = Sheet(uno_sheet)
+    sheet.append_column([1, "x"])
+    assert uno_sheet.writes == [((1, 0, 1, 1), ((1.0,), ("x",)))]